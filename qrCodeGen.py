@@ -1,9 +1,11 @@
 # app.py
 # pip install -r requirements.txt
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 import math
 
+import numpy as np
 import streamlit as st
 import qrcode
 from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
@@ -11,14 +13,12 @@ from PIL import Image, ImageDraw, ImageOps, ImageFilter
 
 # ---------- vCard helpers ----------
 
+_VCARD_TRANS = str.maketrans({"\\": "\\\\", ";": r"\;", ",": r"\,", "\n": r"\n"})
+
 def escape(val: str | None) -> str | None:
     if not val:
         return None
-    return (val.replace("\\", "\\\\")
-               .replace(";", r"\;")
-               .replace(",", r"\,")
-               .replace("\n", r"\n")
-               .strip())
+    return val.translate(_VCARD_TRANS).strip()
 
 def buildVcard(firstName, lastName, org, phone, email, url) -> str:
     firstName, lastName = escape(firstName) or "", escape(lastName) or ""
@@ -38,21 +38,41 @@ def buildVcard(firstName, lastName, org, phone, email, url) -> str:
 
 # ---------- Styled renderer (dots + square finders) ----------
 
-def _isInFinder(row: int, col: int, n: int) -> bool:
-    inTL = (0 <= row < 7) and (0 <= col < 7)
-    inTR = (0 <= row < 7) and (n - 7 <= col < n)
-    inBL = (n - 7 <= row < n) and (0 <= col < 7)
-    return inTL or inTR or inBL
-
-def _drawFinderSquares(draw: ImageDraw.ImageDraw, topLeftX: int, topLeftY: int, modulePx: int, color: tuple):
-    x, y, m = topLeftX, topLeftY, modulePx
-    # Outer ring
-    draw.rectangle([x, y, x + 7*m - 1, y + 1*m - 1], fill=color)
-    draw.rectangle([x, y + 6*m, x + 7*m - 1, y + 7*m - 1], fill=color)
-    draw.rectangle([x, y + 1*m, x + 1*m - 1, y + 6*m - 1], fill=color)
-    draw.rectangle([x + 6*m, y + 1*m, x + 7*m - 1, y + 6*m - 1], fill=color)
-    # Center 3x3
-    draw.rectangle([x + 2*m, y + 2*m, x + 5*m - 1, y + 5*m - 1], fill=color)
+# Finder pattern: 7x7 outer ring + 3x3 center
+_FINDER_TEMPLATE = np.zeros((7, 7), dtype=bool)
+_FINDER_TEMPLATE[[0, 6], :] = True
+_FINDER_TEMPLATE[:, [0, 6]] = True
+_FINDER_TEMPLATE[2:5, 2:5] = True
+
+@lru_cache(maxsize=None)
+def _finderMask(n: int) -> np.ndarray:
+    """Boolean n x n mask that is True over the three 7x7 finder patterns.
+
+    Built once per symbol size (at most 40 versions) and shared read-only.
+    """
+    finder = np.zeros((n, n), dtype=bool)
+    finder[0:7, 0:7] = True
+    finder[0:7, n - 7:n] = True
+    finder[n - 7:n, 0:7] = True
+    finder.flags.writeable = False
+    return finder
+
+def _dataModuleMask(mat: np.ndarray, res_start: int, res_end: int) -> np.ndarray:
+    """Lit modules that are neither part of a finder nor inside the reserved square."""
+    mask = mat.astype(bool) & ~_finderMask(mat.shape[0])
+    if res_start >= 0:
+        mask[res_start:res_end + 1, res_start:res_end + 1] = False
+    return mask
+
+def _collect_module_origins(mask: np.ndarray, modulePx: int, offsetX: int, offsetY: int) -> tuple[np.ndarray, np.ndarray]:
+    """Integer pixel top-left corners (x, y) of every module set in mask."""
+    rows, cols = np.nonzero(mask)
+    return offsetX + cols * modulePx, offsetY + rows * modulePx
+
+def _finderTileMask(modulePx: int) -> Image.Image:
+    """L mask of one finder pattern (7x7 modules) at modulePx pixels per module."""
+    cells = np.kron(_FINDER_TEMPLATE, np.ones((modulePx, modulePx), dtype=bool))
+    return Image.fromarray(cells.astype(np.uint8) * 255)
 
 def _ec_from_choice(choice: str, logo_present: bool) -> int:
     if choice == "Auto":
@@ -64,6 +84,31 @@ def _ec_from_choice(choice: str, logo_present: bool) -> int:
         "H": ERROR_CORRECT_H,
     }[choice]
 
+@lru_cache(maxsize=64)
+def _hex_to_rgba(h: str) -> tuple[int, int, int, int]:
+    """'#rrggbb' -> opaque (r, g, b, 255)."""
+    v = int(h.lstrip("#"), 16)
+    return (v >> 16 & 0xFF, v >> 8 & 0xFF, v & 0xFF, 255)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _qr_matrix(data: str, ec_level: int) -> np.ndarray:
+    """Encode data and return the n x n uint8 module matrix (no border); cached across reruns."""
+    qr = qrcode.QRCode(error_correction=ec_level, border=0, box_size=1)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return np.array(qr.modules, dtype=np.uint8)  # border=0, so modules is the full matrix
+
+# st.cache_data is process-wide (shared by every session); bound the image caches
+@st.cache_data(show_spinner=False, max_entries=4)
+def _open_logo(raw: bytes) -> Image.Image:
+    """Decode uploaded image bytes to RGBA; cached so reruns skip PNG parsing."""
+    return Image.open(BytesIO(raw)).convert("RGBA")
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _resize_logo(raw: bytes, size: int) -> Image.Image:
+    """Logo resized to a size x size square (LANCZOS); cached per (image, size)."""
+    return _open_logo(raw).resize((size, size), Image.LANCZOS)
+
 def _rounded_rect(w: int, h: int, r: int, fill=(255, 255, 255, 255)) -> Image.Image:
     """Create a rounded rectangle RGBA image."""
     img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
@@ -71,6 +116,7 @@ def _rounded_rect(w: int, h: int, r: int, fill=(255, 255, 255, 255)) -> Image.Im
     draw.rounded_rectangle([0, 0, w-1, h-1], radius=r, fill=fill)
     return img
 
+@st.cache_data(show_spinner=False, max_entries=16)  # up to ~4 MB per 1024px render
 def generateStyledQrFixedFill(
     data: str,
     targetPx: int = 250,
@@ -78,9 +124,10 @@ def generateStyledQrFixedFill(
     minModulePx: int = 3,
     requiredQuietModules: int = 4,
     dotScale: float = 0.82,
+    moduleShape: str = "Dots",          # "Dots" or "Squares"
     colorHex: str = "#000000",
     # Center image options
-    centerImage: Image.Image | None = None,
+    centerImageBytes: bytes | None = None,  # encoded logo image (e.g. PNG upload)
     centerScale: float = 0.20,          # fraction of total PNG size for logo bitmap
     # Reserve options (draw around the image)
     reserveModules: int | None = None,  # side length of reserved square in MODULES (no data drawn)
@@ -90,44 +137,47 @@ def generateStyledQrFixedFill(
     # Error correction
     errorCorrectionChoice: str = "Auto" # "Auto", "L", "M", "Q", "H"
 ) -> Image.Image:
-    logo_present = centerImage is not None
+    """Render data as a styled QR on a transparent targetPx x targetPx RGBA canvas.
+
+    Performance: rendering is bound by PIL call count and pixel traffic, not
+    arithmetic, so SIMD-style micro-optimization doesn't help here. Profile with
+    cProfile (+ snakeviz); the per-dot blit loop should dominate. Wins, in
+    priority order: (1) cache the QR matrix (_qr_matrix) and whole renders
+    (st.cache_data here), (2) classify modules with NumPy masks, (3) blit one
+    pre-rendered dot tile, (4) use the NEAREST-upscale path for square modules.
+    """
+    logo_present = centerImageBytes is not None
     ec_level = _ec_from_choice(errorCorrectionChoice, logo_present)
 
-    qr = qrcode.QRCode(error_correction=ec_level, border=0, box_size=1)
-    qr.add_data(data)
-    qr.make(fit=True)
-    mat = qr.get_matrix()
-    n = len(mat)  # number of modules
+    mat = _qr_matrix(data, ec_level)
+    n = mat.shape[0]  # number of modules
 
     # Compute module size to hit symbolPxGoal while honoring quiet zone
-    modulePx = max(minModulePx, symbolPxGoal // n)
-    while True:
-        symbolPxUsed = modulePx * n
-        marginPerSide = (targetPx - symbolPxUsed) // 2
-        if marginPerSide >= requiredQuietModules * modulePx:
-            break
-        modulePx -= 1
-        if modulePx < minModulePx:
-            raise ValueError("targetPx too small for quiet zone; raise targetPx or lower quiet zone.")
+    # (targetPx - modulePx*n)//2 >= quiet*modulePx  <=>  modulePx <= targetPx // (n + 2*quiet)
+    modulePx = min(max(minModulePx, symbolPxGoal // n), targetPx // (n + 2 * requiredQuietModules))
+    if modulePx < minModulePx:
+        raise ValueError("targetPx too small for quiet zone; raise targetPx or lower quiet zone.")
     symbolPxUsed = modulePx * n
     marginPerSide = (targetPx - symbolPxUsed) // 2
 
-    img = Image.new("RGBA", (targetPx, targetPx), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    color = tuple(int(colorHex.strip("#")[i:i+2], 16) for i in (0, 2, 4)) + (255,)
+    # Symbol is drawn as a 1-byte coverage mask and tinted once at the end.
+    # It spans the whole canvas so dot tiles may overhang the last module.
+    sym = Image.new("L", (targetPx, targetPx), 0)
+    color = _hex_to_rgba(colorHex)
 
     offsetX, offsetY = marginPerSide, marginPerSide
 
     # Finder patterns
+    finder_mask = _finderTileMask(modulePx)
     for fr, fc in [(0, 0), (0, n - 7), (n - 7, 0)]:
         x = offsetX + fc * modulePx
         y = offsetY + fr * modulePx
-        _drawFinderSquares(draw, x, y, modulePx, color)
+        sym.paste(255, (x, y, x + 7 * modulePx, y + 7 * modulePx), finder_mask)
 
     # Determine reserved square in MODULE coordinates (centered)
     # If not provided explicitly, infer from centerScale and padding.
     res_modules = 0
-    if centerImage is not None:
+    if centerImageBytes is not None:
         # Convert desired logo pixel size to modules (+ padding)
         desired_logo_px = max(1, int(targetPx * centerScale))
         # total reserved pixels = logo + 2*padding_in_px
@@ -145,28 +195,37 @@ def generateStyledQrFixedFill(
     else:
         res_start = res_end = -1  # no reserve
 
-    # Data dots (skip finders and reserved square)
-    radius = (modulePx * dotScale) / 2.0
-    for row in range(n):
-        for col in range(n):
-            if not mat[row][col]:
-                continue
-            if _isInFinder(row, col, n):
-                continue
-            if res_modules > 0 and (res_start <= row <= res_end) and (res_start <= col <= res_end):
-                # Skip drawing inside reserved region
-                continue
-            cx = offsetX + col * modulePx + modulePx / 2.0
-            cy = offsetY + row * modulePx + modulePx / 2.0
-            bbox = [int(round(cx - radius)), int(round(cy - radius)),
-                    int(round(cx + radius)), int(round(cy + radius))]
-            draw.ellipse(bbox, fill=color)
+    # Data modules (skip finders and reserved square)
+    draw_mask = _dataModuleMask(mat, res_start, res_end)
+
+    if moduleShape == "Squares":
+        # Render at module resolution and let PIL upscale; no per-module work
+        small = Image.fromarray(draw_mask.astype(np.uint8) * 255)
+        big = small.resize((symbolPxUsed, symbolPxUsed), Image.NEAREST)
+        sym.paste(255, (offsetX, offsetY, offsetX + symbolPxUsed, offsetY + symbolPxUsed), big)
+    else:
+        xs, ys = _collect_module_origins(draw_mask, modulePx, offsetX, offsetY)
+
+        # Rasterize one dot and blit it at every lit module. Every module center
+        # has the same fractional part, so the rounded bbox extents relative to
+        # the module's top-left corner are the same for all dots. Round half up:
+        # round() would push both extents outward at .5 ties and merge dots.
+        radius = (modulePx * dotScale) / 2.0
+        lo = math.floor(modulePx / 2.0 - radius + 0.5)
+        hi = math.floor(modulePx / 2.0 + radius + 0.5)
+        tile_size = hi - lo + 1
+        dot_tile = Image.new("L", (tile_size, tile_size), 0)
+        ImageDraw.Draw(dot_tile).ellipse([0, 0, tile_size - 1, tile_size - 1], fill=255)
+        for x0, y0 in zip((xs + lo).tolist(), (ys + lo).tolist()):
+            sym.paste(dot_tile, (x0, y0), dot_tile)
+
+    img = Image.new("RGBA", (targetPx, targetPx), (0, 0, 0, 0))
+    img.paste(color, mask=sym)
 
     # Backdrop + logo (centered)
-    if centerImage is not None:
-        logo = centerImage.convert("RGBA")
+    if centerImageBytes is not None:
         logo_size = max(1, int(targetPx * centerScale))
-        logo = logo.resize((logo_size, logo_size), Image.LANCZOS)
+        logo = _resize_logo(centerImageBytes, logo_size)
 
         # Compute reserved px rect (use the same values as above)
         pad_px = reservePaddingModules * modulePx
@@ -185,7 +244,11 @@ def generateStyledQrFixedFill(
         # Center logo on top
         posX = (targetPx - logo_size) // 2
         posY = (targetPx - logo_size) // 2
-        img.alpha_composite(logo, (posX, posY))
+        alpha_lo, alpha_hi = logo.getextrema()[3]
+        if alpha_lo == 255:
+            img.paste(logo, (posX, posY))  # fully opaque: plain copy, no blending
+        elif alpha_hi > 0:
+            img.alpha_composite(logo, (posX, posY))
 
     return img
 
@@ -201,7 +264,8 @@ with st.sidebar:
     symbolPxGoal = st.slider("Symbol pixel goal (px)", 100, targetPx, 200, step=5)
     minModulePx = st.slider("Minimum module size (px)", 1, 10, 3, step=1)
     requiredQuietModules = st.slider("Quiet zone (modules each side)", 0, 8, 4, step=1)
-    dotScale = st.slider("Dot scale per module", 0.5, 1.0, 0.82, step=0.01)
+    moduleShape = st.selectbox("Module shape", ["Dots", "Squares"], index=0)
+    dotScale = st.slider("Dot scale per module", 0.5, 1.0, 0.82, step=0.01, help="Only used for dots.")
     colorHex = st.color_picker("QR color", "#000000")
 
     st.markdown("---")
@@ -220,18 +284,20 @@ with st.sidebar:
 
 tabV, tabL = st.tabs(["vCard", "Link"])
 
-def buildCenterImage():
+def buildCenterImageBytes():
     if uploaded is None:
         return None
+    raw = uploaded.getvalue()
     try:
-        return Image.open(uploaded)
+        _open_logo(raw)
+        return raw
     except Exception:
         st.warning("Could not open uploaded file as an image.")
         return None
 
 def render_and_download(payload: str, filename: str):
     try:
-        centerImg = buildCenterImage()
+        centerBytes = buildCenterImageBytes()
         # If user disabled reserve, set reserveModules to 0 so we don't skip modules.
         res_override = None if (useReserve and reserveModules == 0) else (reserveModules if useReserve else 0)
 
@@ -242,8 +308,9 @@ def render_and_download(payload: str, filename: str):
             minModulePx=minModulePx,
             requiredQuietModules=requiredQuietModules,
             dotScale=dotScale,
+            moduleShape=moduleShape,
             colorHex=colorHex,
-            centerImage=centerImg,
+            centerImageBytes=centerBytes,
             centerScale=centerScale,
             reserveModules=res_override,
             reservePaddingModules=reservePaddingModules if useReserve else 0,
@@ -251,6 +318,7 @@ def render_and_download(payload: str, filename: str):
             backdropCornerRadiusPx=backdropCornerRadiusPx,
             errorCorrectionChoice=ec_choice,
         )
+        # Preview takes the Image directly; only the download needs full PNG bytes
         st.image(img, caption="QR preview", use_container_width=False)
 
         buf = BytesIO()
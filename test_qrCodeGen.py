@@ -0,0 +1,127 @@
+# pytest -q
+import math
+
+import numpy as np
+import pytest
+import qrcode
+from qrcode.constants import ERROR_CORRECT_L
+from PIL import Image, ImageDraw
+
+import qrCodeGen as app
+
+DATA = "BEGIN:VCARD\r\nN:Doe;Jane;;;\r\nEND:VCARD"
+
+# (reserveModules, requiredQuietModules)
+LAYOUTS = [(None, 4), (9, 4), (None, 1), (11, 2)]
+
+
+def _matrix(data: str) -> list[list[bool]]:
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_L, border=0, box_size=1)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _isInFinder(row: int, col: int, n: int) -> bool:
+    inTL = (0 <= row < 7) and (0 <= col < 7)
+    inTR = (0 <= row < 7) and (n - 7 <= col < n)
+    inBL = (n - 7 <= row < n) and (0 <= col < 7)
+    return inTL or inTR or inBL
+
+
+def _reserveRange(n: int, reserveModules: int | None) -> tuple[int, int]:
+    res_modules = max(0, min(n, reserveModules or 0))
+    if res_modules == 0:
+        return -1, -1
+    res_start = (n - res_modules) // 2
+    return res_start, res_start + res_modules - 1
+
+
+def _layout(n: int, targetPx: int, symbolPxGoal: int, minModulePx: int, quiet: int) -> tuple[int, int]:
+    """Decrementing module-size search; returns (modulePx, offset)."""
+    modulePx = max(minModulePx, symbolPxGoal // n)
+    while (targetPx - modulePx * n) // 2 < quiet * modulePx:
+        modulePx -= 1
+        assert modulePx >= minModulePx
+    return modulePx, (targetPx - modulePx * n) // 2
+
+
+def _reference_render(data, targetPx, symbolPxGoal, requiredQuietModules, dotScale, reserveModules):
+    """Per-module draw.rectangle / draw.ellipse renderer the tiled path must match."""
+    mat = _matrix(data)
+    n = len(mat)
+    modulePx, offset = _layout(n, targetPx, symbolPxGoal, 1, requiredQuietModules)
+    res_start, res_end = _reserveRange(n, reserveModules)
+    img = Image.new("RGBA", (targetPx, targetPx), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    color = (0, 0, 0, 255)
+    m = modulePx
+    for fr, fc in [(0, 0), (0, n - 7), (n - 7, 0)]:
+        x, y = offset + fc * m, offset + fr * m
+        draw.rectangle([x, y, x + 7*m - 1, y + 1*m - 1], fill=color)
+        draw.rectangle([x, y + 6*m, x + 7*m - 1, y + 7*m - 1], fill=color)
+        draw.rectangle([x, y + 1*m, x + 1*m - 1, y + 6*m - 1], fill=color)
+        draw.rectangle([x + 6*m, y + 1*m, x + 7*m - 1, y + 6*m - 1], fill=color)
+        draw.rectangle([x + 2*m, y + 2*m, x + 5*m - 1, y + 5*m - 1], fill=color)
+    radius = (modulePx * dotScale) / 2.0
+    for row in range(n):
+        for col in range(n):
+            if not mat[row][col] or _isInFinder(row, col, n):
+                continue
+            if res_start <= row <= res_end and res_start <= col <= res_end:
+                continue
+            cx = offset + col * m + m / 2.0
+            cy = offset + row * m + m / 2.0
+            # Baseline bbox, but rounded half up so .5 ties size every dot alike
+            bbox = [math.floor(cx - radius + 0.5), math.floor(cy - radius + 0.5),
+                    math.floor(cx + radius + 0.5), math.floor(cy + radius + 0.5)]
+            draw.ellipse(bbox, fill=color)
+    return img
+
+
+def _kwargs(modulePx: int, quiet: int) -> dict:
+    n = len(_matrix(DATA))
+    return dict(targetPx=modulePx * (n + 2 * quiet), symbolPxGoal=modulePx * n, requiredQuietModules=quiet)
+
+
+@pytest.mark.parametrize("reserveModules, quiet", LAYOUTS)
+@pytest.mark.parametrize("modulePx", [2, 3, 4, 6, 7, 9, 12])
+@pytest.mark.parametrize("dotScale", [0.55, 0.82, 0.93, 1.0])
+def test_dot_tiles_match_per_module_ellipses(modulePx, dotScale, reserveModules, quiet):
+    kwargs = dict(_kwargs(modulePx, quiet), dotScale=dotScale, reserveModules=reserveModules)
+    img = app.generateStyledQrFixedFill(DATA, minModulePx=1, errorCorrectionChoice="L", **kwargs)
+    assert np.array_equal(np.asarray(img), np.asarray(_reference_render(DATA, **kwargs)))
+
+
+@pytest.mark.parametrize("modulePx, dotScale", [(10, 0.9), (6, 0.5), (4, 0.75), (8, 0.875), (5, 0.8), (12, 0.75)])
+def test_dot_tiles_at_rounding_ties(modulePx, dotScale):
+    radius = (modulePx * dotScale) / 2.0
+    assert (modulePx / 2.0 - radius) % 1 == 0.5  # exact tie
+    kwargs = dict(_kwargs(modulePx, 4), dotScale=dotScale, reserveModules=None)
+    img = app.generateStyledQrFixedFill(DATA, minModulePx=1, errorCorrectionChoice="L", **kwargs)
+    assert np.array_equal(np.asarray(img), np.asarray(_reference_render(DATA, **kwargs)))
+    # Half-up keeps each dot within one module pitch
+    lo = math.floor(modulePx / 2.0 - radius + 0.5)
+    hi = math.floor(modulePx / 2.0 + radius + 0.5)
+    assert hi - lo + 1 <= modulePx
+
+
+@pytest.mark.parametrize("reserveModules, quiet", [(None, 4), (9, 2)])
+@pytest.mark.parametrize("modulePx", [2, 5, 8])
+def test_square_modules_are_upscaled_matrix(modulePx, reserveModules, quiet):
+    mat = np.array(_matrix(DATA), dtype=bool)
+    n = mat.shape[0]
+    res_start, res_end = _reserveRange(n, reserveModules)
+    if res_start >= 0:
+        mat[res_start:res_end + 1, res_start:res_end + 1] = False
+    kwargs = _kwargs(modulePx, quiet)
+    img = app.generateStyledQrFixedFill(DATA, minModulePx=1, errorCorrectionChoice="L", moduleShape="Squares",
+                                        colorHex="#123456", reserveModules=reserveModules, **kwargs)
+    # Finder modules are part of the matrix, so the whole symbol is the upscaled matrix
+    offset = quiet * modulePx
+    expected = np.zeros((kwargs["targetPx"],) * 2, dtype=bool)
+    expected[offset:offset + n * modulePx, offset:offset + n * modulePx] = np.kron(mat, np.ones((modulePx, modulePx), dtype=bool))
+    px = np.asarray(img)
+    assert np.array_equal(px[..., 3] == 255, expected)
+    assert np.array_equal(px[..., 3] == 0, ~expected)
+    assert (px[expected][:, :3] == (0x12, 0x34, 0x56)).all()